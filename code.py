@@ -1,11 +1,145 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go 
 
+from common import (
+    load_data,
+    apply_filters,
+    agg_timeseries,
+    agg_heat,
+    agg_country,
+    agg_region,
+    ts_stats,
+    load_country_geojson,
+    country_geojson_ids
+)
+
+#cached figure builders: figures are built once per filter selection and shared
+#read-only, so reruns with unchanged filters skip all Plotly object construction
+@st.cache_resource(max_entries=32)
+def ts_figure(*filters):
+    ts = agg_timeseries(*filters)
+
+    fig_ts = px.line(
+        ts,
+        x="Date",
+        y="Deaths",
+        color="Agegroup_pretty",
+        markers=True,
+        labels={
+            "Date": "Month",
+            "Deaths": "Deaths",
+            "Agegroup_pretty": "Age group"
+        },
+        title="Monthly COVID-19 deaths by age group"
+    )
+
+    median_deaths, mode_deaths = ts_stats(*filters)
+
+    x_min = ts["Date"].min()
+    x_max = ts["Date"].max()
+
+    fig_ts.add_trace(
+        go.Scatter(
+            x=[x_min, x_max],
+            y=[median_deaths, median_deaths],
+            mode="lines",
+            name=f"Median deaths ({median_deaths:,.0f})",
+            line=dict(dash="dash")
+        )
+    )
+
+    if mode_deaths is not None:
+        fig_ts.add_trace(
+            go.Scatter(
+                x=[x_min, x_max],
+                y=[mode_deaths, mode_deaths],
+                mode="lines",
+                name=f"Mode deaths ({mode_deaths:,.0f})",
+                line=dict(dash="dot")
+            )
+        )
+
+    fig_ts.update_layout(legend_title_text="Age group / Statistics")
+
+    return fig_ts
+
+
+@st.cache_resource(max_entries=32)
+def heatmap_figure(*filters):
+    pivot = agg_heat(*filters)
+
+    fig_hm = go.Figure(
+        go.Heatmap(
+            z=pivot.to_numpy(),
+            x=pivot.columns.tolist(),
+            y=pivot.index.tolist(),
+            colorscale="Reds",
+            colorbar=dict(title="Deaths")
+        )
+    )
+
+    fig_hm.update_layout(
+        title="Total deaths by age group and year",
+        xaxis_title="Year",
+        yaxis_title="Age group"
+    )
+    fig_hm.update_xaxes(dtick=1)
+    fig_hm.update_yaxes(autorange="reversed")
+
+    return fig_hm
+
+
+@st.cache_resource(max_entries=32)
+def map_figure(*filters):
+    map_data = agg_country(*filters)
+
+    #country outlines keyed by ISO3 code
+    fig_map = go.Figure(
+        go.Choroplethmap(
+            geojson=load_country_geojson(),
+            locations=map_data["Country_code"],
+            z=map_data["Deaths"],
+            text=map_data["Country"],
+            hovertemplate="%{text}<br>Deaths: %{z:,.0f}<extra></extra>",
+            colorscale="Reds",
+            colorbar=dict(title="Deaths"),
+            marker_line_width=0
+        )
+    )
+
+    fig_map.update_layout(
+        title="Total COVID-19 deaths by country (filtered)",
+        map_style="carto-positron",
+        map_zoom=0.6,
+        map_center=dict(lat=20, lon=0),
+        margin=dict(l=0, r=0, t=40, b=0)
+    )
+
+    return fig_map
+
+
+@st.cache_resource(max_entries=32)
+def bar_figure(*filters):
+    region_deaths = agg_region(*filters)
+
+    fig_bar = px.bar(
+        region_deaths,
+        x="Who_region_pretty",
+        y="Deaths",
+        labels={
+            "Who_region_pretty": "WHO region",
+            "Deaths": "Deaths"
+        },
+        title="Total COVID-19 deaths by WHO region (filtered)"
+    )
+    fig_bar.update_xaxes(tickangle=-30)
+
+    return fig_bar
+
+
 #beginning page
 st.set_page_config(
     page_title="COVID-19 Global Mortality by Age )",
@@ -21,41 +155,8 @@ quickly understand **where and for whom** the burden of mortality is highest.
 """
 )
 
-
 #loading the data 
-@st.cache_data
-def load_data():
-    data_path = "WHO-COVID-19-global-monthly-death-by-age-data.csv"
-    df = pd.read_csv(data_path)
-
-    df["Deaths"] = df["Deaths"].fillna(0)
-    df["Date"] = pd.to_datetime(
-        df["Year"].astype(str) + "-" + df["Month"].astype(str) + "-01",
-        errors="coerce"
-    )
-
-    age_map = {
-        "0_4": "0–4",
-        "5_14": "5–14",
-        "15_64": "15–64",
-        "65+": "65+"
-    }
-    df["Agegroup_pretty"] = df["Agegroup"].map(age_map).fillna(df["Agegroup"])
-
-    region_map = {
-        "AFR": "African Region",
-        "AMR": "Region of the Americas",
-        "EMR": "Eastern Mediterranean Region",
-        "EUR": "European Region",
-        "SEAR": "South-East Asia Region",
-        "WPR": "Western Pacific Region"
-    }
-    df["Who_region_pretty"] = df["Who_region"].map(region_map).fillna(df["Who_region"])
-
-    return df
-
-
-df = load_data()
+_, regions_all, income_levels_all, countries_all, agegroups_all, year_bounds = load_data()
 
 
 #sidebar and filters for dashboard
@@ -66,27 +167,25 @@ st.sidebar.markdown(f"**Role:** {role}")
 
 st.sidebar.markdown("---")
 
-regions = ["All regions"] + sorted(df["Who_region_pretty"].dropna().unique().tolist())
+regions = ("All regions",) + regions_all
 region_selected = st.sidebar.selectbox("WHO Region", regions)
 
-income_levels = ["All income levels"] + sorted(df["Wb_income"].dropna().unique().tolist())
+income_levels = ("All income levels",) + income_levels_all
 income_selected = st.sidebar.selectbox("World Bank Income Group", income_levels)
 
-countries_all = sorted(df["Country"].dropna().unique().tolist())
 countries_selected = st.sidebar.multiselect(
     "Countries (optional)",
     options=countries_all,
     default=[]
 )
 
-agegroups_all = sorted(df["Agegroup_pretty"].unique().tolist())
 agegroups_selected = st.sidebar.multiselect(
     "Age groups",
     options=agegroups_all,
     default=agegroups_all
 )
 
-year_min, year_max = int(df["Year"].min()), int(df["Year"].max())
+year_min, year_max = year_bounds
 year_range = st.sidebar.slider(
     "Year range",
     min_value=year_min,
@@ -98,46 +197,45 @@ year_range = st.sidebar.slider(
 st.sidebar.markdown("---")
 show_raw = st.sidebar.checkbox("Show filtered data table", value=False)
 
-filtered = df.copy()
-
-if region_selected != "All regions":
-    filtered = filtered[filtered["Who_region_pretty"] == region_selected]
-
-if income_selected != "All income levels":
-    filtered = filtered[filtered["Wb_income"] == income_selected]
-
-if countries_selected:
-    filtered = filtered[filtered["Country"].isin(countries_selected)]
-
-if agegroups_selected:
-    filtered = filtered[filtered["Agegroup_pretty"].isin(agegroups_selected)]
-
-filtered = filtered[
-    (filtered["Year"] >= year_range[0]) &
-    (filtered["Year"] <= year_range[1])
-]
+#lists are not hashable, so the cache key uses tuples
+filters = (
+    region_selected,
+    income_selected,
+    tuple(countries_selected),
+    tuple(agegroups_selected),
+    year_range[0],
+    year_range[1]
+)
+filtered = apply_filters(*filters)
 
 if filtered.empty:
     st.error("No data for the current filter selection. Try widening your filters.")
     st.stop()
 
-#kpi metrics
-total_deaths = filtered["Deaths"].sum()
+#kpi metrics, computed on the raw arrays in one pass
+deaths = filtered["Deaths"].to_numpy()
+dates = filtered["Date"].to_numpy()
 
-max_date = filtered["Date"].max()
+#float32 is exact only up to 2**24, so the KPI totals accumulate in float64
+total_deaths = deaths.sum(dtype=np.float64)
+
+#rows are sorted by Year and Month, so the latest date is the last row
+max_date = filtered["Date"].iat[-1]
 last_12_months_start = max_date - pd.DateOffset(months=12)
-recent = filtered[filtered["Date"] >= last_12_months_start]
-recent_deaths = recent["Deaths"].sum()
-
-age_summary = (
-    filtered
-    .groupby("Agegroup_pretty")["Deaths"]
-    .sum()
-    .sort_values(ascending=False)
-)
+#the same ordering makes the 12-month window a tail slice
+recent_start = np.searchsorted(dates, last_12_months_start.to_datetime64())
+recent_deaths = deaths[recent_start:].sum(dtype=np.float64)
 
-top_agegroup = age_summary.index[0]
-top_age_deaths = age_summary.iloc[0]
+age_cats = filtered["Agegroup_pretty"].cat.categories
+age_codes = filtered["Agegroup_pretty"].cat.codes.to_numpy()
+per_age = np.bincount(age_codes, weights=deaths, minlength=len(age_cats))
+age_rows = np.bincount(age_codes, minlength=len(age_cats))
+
+#only age groups that have rows in the selection can be the top group
+present = np.flatnonzero(age_rows)
+top_age = present[per_age[present].argmax()]
+top_agegroup = age_cats[top_age]
+top_age_deaths = per_age[top_age]
 
 col1, col2, col3 = st.columns(3)
 
@@ -162,57 +260,9 @@ st.markdown("---")
 #first graph
 st.subheader("Monthly deaths over time by age group (with median & mode)")
 
-ts = (
-    filtered
-    .groupby(["Date", "Agegroup_pretty"], as_index=False)["Deaths"]
-    .sum()
-    .sort_values("Date")
-)
-
-fig_ts = px.line(
-    ts,
-    x="Date",
-    y="Deaths",
-    color="Agegroup_pretty",
-    markers=True,
-    labels={
-        "Date": "Month",
-        "Deaths": "Deaths",
-        "Agegroup_pretty": "Age group"
-    },
-    title="Monthly COVID-19 deaths by age group"
-)
-
-median_deaths = ts["Deaths"].median()
-mode_values = ts["Deaths"].mode()
-mode_deaths = mode_values.iloc[0] if not mode_values.empty else None
-
-x_min = ts["Date"].min()
-x_max = ts["Date"].max()
-
-fig_ts.add_trace(
-    go.Scatter(
-        x=[x_min, x_max],
-        y=[median_deaths, median_deaths],
-        mode="lines",
-        name=f"Median deaths ({median_deaths:,.0f})",
-        line=dict(dash="dash")
-    )
-)
-
-if mode_deaths is not None:
-    fig_ts.add_trace(
-        go.Scatter(
-            x=[x_min, x_max],
-            y=[mode_deaths, mode_deaths],
-            mode="lines",
-            name=f"Mode deaths ({mode_deaths:,.0f})",
-            line=dict(dash="dot")
-        )
-    )
+median_deaths, mode_deaths = ts_stats(*filters)
 
-fig_ts.update_layout(legend_title_text="Age group / Statistics")
-st.plotly_chart(fig_ts, use_container_width=True)
+st.plotly_chart(ts_figure(*filters), use_container_width=True)
 
 st.markdown(
     f"""
@@ -227,27 +277,7 @@ st.markdown(
 #second graph
 st.subheader("Deaths by age group and year (Heatmap)")
 
-heat = (
-    filtered
-    .groupby(["Year", "Agegroup_pretty"], as_index=False)["Deaths"]
-    .sum()
-)
-
-pivot = heat.pivot(index="Agegroup_pretty", columns="Year", values="Deaths")
-
-fig_hm, ax_hm = plt.subplots(figsize=(8, 4))
-sns.heatmap(
-    pivot,
-    annot=False,
-    fmt=".0f",
-    ax=ax_hm
-)
-
-ax_hm.set_title("Total deaths by age group and year")
-ax_hm.set_xlabel("Year")
-ax_hm.set_ylabel("Age group")
-
-st.pyplot(fig_hm, use_container_width=True)
+st.plotly_chart(heatmap_figure(*filters), use_container_width=True)
 
 st.markdown(
     """
@@ -262,40 +292,20 @@ st.subheader("Global Map with COVID-19 deaths by country")
 st.write("Filtered rows:", len(filtered))
 st.write("Unique countries in filtered data:", filtered["Country"].nunique())
 
-map_data = (
-    filtered
-    .groupby("Country", as_index=False)["Deaths"]
-    .sum()
-)
-
-map_data = map_data.dropna(subset=["Country"])
-map_data = map_data[map_data["Country"] != "Unknown"]
+map_data = agg_country(*filters)
 
 if map_data.empty:
     st.warning("No country-level data available for the selected filters.")
 else:
     try:
-        fig_map = px.choropleth(
-            map_data,
-            locations="Country",
-            locationmode="country names",
-            color="Deaths",
-            color_continuous_scale="Reds",
-            title="Total COVID-19 deaths by country (filtered)",
-        )
+        st.plotly_chart(map_figure(*filters), use_container_width=True)
 
-        fig_map.update_geos(
-            projection_type="natural earth",
-            showcountries=True,
-            showcoastlines=True,
-            coastlinecolor="gray",
-            showland=True,
-            landcolor="white",
-            showocean=True,
-            oceancolor="#d0e7f7"
-        )
-
-        st.plotly_chart(fig_map, use_container_width=True)
+        unmapped = map_data[~map_data["Country_code"].isin(country_geojson_ids())]
+        if not unmapped.empty:
+            st.caption(
+                f"{len(unmapped)} countries/areas in the selection have no outline at this "
+                f"map resolution and are not shown: {', '.join(sorted(unmapped['Country']))}."
+            )
 
     except Exception as e:
         st.error("❌ Error while building the choropleth map.")
@@ -304,21 +314,7 @@ else:
 #fourth graph
 st.subheader("Total deaths by WHO region")
 
-region_deaths = (
-    filtered
-    .groupby("Who_region_pretty", as_index=False)["Deaths"]
-    .sum()
-    .sort_values("Deaths", ascending=False)
-)
-
-fig_bar, ax_bar = plt.subplots(figsize=(8, 4))
-ax_bar.bar(region_deaths["Who_region_pretty"], region_deaths["Deaths"])
-ax_bar.set_title("Total COVID-19 deaths by WHO region (filtered)")
-ax_bar.set_xlabel("WHO region")
-ax_bar.set_ylabel("Deaths")
-plt.xticks(rotation=30, ha="right")
-
-st.pyplot(fig_bar, use_container_width=True)
+st.plotly_chart(bar_figure(*filters), use_container_width=True)
 
 st.markdown(
     """
@@ -0,0 +1,336 @@
+"""Data loading, filtering and aggregation shared by the dashboard pages.
+
+Streamlit keys st.cache_data entries on the function object, so pages that
+import these helpers share one cached dataset and one set of aggregates.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+import streamlit as st
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+#loading the data 
+def prepare_data():
+    data_path = Path("WHO-COVID-19-global-monthly-death-by-age-data.csv")
+    cache_path = Path("who_covid.parquet")
+
+    #reuse the prepared parquet sidecar unless the csv or this script is newer
+    source_mtime = max(data_path.stat().st_mtime, Path(__file__).stat().st_mtime)
+    if cache_path.exists() and cache_path.stat().st_mtime >= source_mtime:
+        try:
+            return pd.read_parquet(cache_path, engine="pyarrow")
+        except (OSError, ValueError):
+            #unreadable sidecar (e.g. truncated): fall through and rebuild it from the csv
+            pass
+
+    #explicit schema: labels come in dictionary-encoded (pandas categoricals)
+    label = pa.dictionary(pa.int32(), pa.string())
+    table = pv.read_csv(
+        data_path,
+        convert_options=pv.ConvertOptions(
+            column_types={
+                "Country": label,
+                "Country_code": label,
+                "Who_region": label,
+                "Wb_income": label,
+                "Year": pa.int16(),
+                "Month": pa.int8(),
+                "Agegroup": label,
+                "Deaths": pa.float32()
+            },
+            strings_can_be_null=True
+        )
+    )
+    df = table.to_pandas()
+
+    #rows without a real country are never shown, so drop them once here
+    df = df[df["Country"].notna() & (df["Country"] != "Unknown")].reset_index(drop=True)
+    df["Country"] = df["Country"].cat.remove_unused_categories()
+
+    #keep Deaths float32 after the fill (Year/Month are already int16/int8 from the schema)
+    df["Deaths"] = df["Deaths"].fillna(0).astype(np.float32)
+    df["Date"] = pd.to_datetime(
+        {"year": df["Year"], "month": df["Month"], "day": 1},
+        errors="coerce"
+    )
+
+    age_map = {
+        "0_4": "0–4",
+        "5_14": "5–14",
+        "15_64": "15–64",
+        "65+": "65+"
+    }
+    df["Agegroup_pretty"] = df["Agegroup"].map(age_map).fillna(df["Agegroup"])
+
+    region_map = {
+        "AFR": "African Region",
+        "AMR": "Region of the Americas",
+        "EMR": "Eastern Mediterranean Region",
+        "EUR": "European Region",
+        "SEAR": "South-East Asia Region",
+        "WPR": "Western Pacific Region"
+    }
+    df["Who_region_pretty"] = df["Who_region"].map(region_map).fillna(df["Who_region"])
+
+    #derived labels as categoricals too, so groupby/isin work on integer codes;
+    #categories are sorted because csv dictionaries come in file order
+    for col in ["Who_region_pretty", "Wb_income", "Agegroup_pretty", "Country", "Who_region", "Agegroup"]:
+        df[col] = df[col].astype("category")
+        df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+
+    #year-sorted rows let filters slice the year range with searchsorted
+    df = df.sort_values(["Year", "Month"], kind="stable").reset_index(drop=True)
+
+    #write to a temp file and swap it in, so a failed write never leaves a partial sidecar
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            dir=cache_path.parent, prefix=cache_path.name, suffix=".tmp", delete=False
+        ) as tmp:
+            tmp_path = tmp.name
+        df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        #NamedTemporaryFile creates 0600; give the sidecar the mode a plain open() would
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        #read-only deployments just parse the csv on every cold start
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return df
+
+
+#sidebar option lists and year bounds are computed once here rather than on every rerun
+@st.cache_data
+def load_data():
+    df = prepare_data()
+
+    return (
+        df,
+        tuple(sorted(df["Who_region_pretty"].dropna().unique())),
+        tuple(sorted(df["Wb_income"].dropna().unique())),
+        tuple(sorted(df["Country"].dropna().unique())),
+        tuple(sorted(df["Agegroup_pretty"].dropna().unique())),
+        (int(df["Year"].min()), int(df["Year"].max()))
+    )
+
+
+#country outlines from Natural Earth 1:110m (public domain), feature ids are ISO3 codes;
+#small territories below that resolution have no outline
+@st.cache_data
+def load_country_geojson():
+    with open("countries.geo.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@st.cache_data
+def country_geojson_ids():
+    return frozenset(feature["id"] for feature in load_country_geojson()["features"])
+
+
+def filter_rows(frame, region, income, countries, agegroups, yr_lo, yr_hi):
+    #frame is sorted by Year, so the year range is a contiguous slice
+    years = frame["Year"].to_numpy()
+    frame = frame.iloc[years.searchsorted(yr_lo):years.searchsorted(yr_hi, side="right")]
+
+    mask = np.ones(len(frame), dtype=bool)
+
+    if region != "All regions":
+        mask &= (frame["Who_region_pretty"] == region).to_numpy()
+
+    if income != "All income levels":
+        mask &= (frame["Wb_income"] == income).to_numpy()
+
+    if countries:
+        mask &= frame["Country"].isin(countries).to_numpy()
+
+    if agegroups:
+        mask &= frame["Agegroup_pretty"].isin(agegroups).to_numpy()
+
+    return frame.iloc[np.flatnonzero(mask)]
+
+
+#cached filtering and aggregations, keyed on the filter selection only;
+#the data itself comes from the cached load_data, so it never enters the key
+@st.cache_data(max_entries=32)
+def apply_filters(*filters):
+    return filter_rows(load_data()[0], *filters)
+
+
+#deaths pre-summed over every filter/chart dimension, so charts never touch the raw rows;
+#sort=False keeps groups in first-seen order, i.e. still sorted by Year
+@st.cache_data
+def base_cube():
+    return (
+        load_data()[0]
+        .groupby(
+            ["Date", "Year", "Country", "Country_code", "Who_region_pretty", "Wb_income", "Agegroup_pretty"],
+            as_index=False,
+            observed=True,
+            sort=False,
+            dropna=False
+        )["Deaths"]
+        .sum()
+    )
+
+
+@st.cache_data(max_entries=32)
+def filter_cube(*filters):
+    return filter_rows(base_cube(), *filters)
+
+
+#group sums over integer codes: one np.bincount per chart instead of a hashed groupby
+def groupsum2d(rows, cols, vals, nr, nc):
+    flat = rows.astype(np.intp) * nc + cols
+    sums = np.bincount(flat, weights=vals, minlength=nr * nc).reshape(nr, nc)
+    counts = np.bincount(flat, minlength=nr * nc).reshape(nr, nc)
+    return sums, counts
+
+
+if numba is not None:
+    #same result from one compiled pass over the rows, without building the flat index
+    @numba.njit(cache=True)
+    def _groupsum2d_numba(rows, cols, vals, nr, nc):
+        sums = np.zeros((nr, nc), dtype=np.float64)
+        counts = np.zeros((nr, nc), dtype=np.int64)
+        for i in range(vals.size):
+            sums[rows[i], cols[i]] += vals[i]
+            counts[rows[i], cols[i]] += 1
+        return sums, counts
+
+    def groupsum2d(rows, cols, vals, nr, nc):
+        return _groupsum2d_numba(
+            np.ascontiguousarray(rows, dtype=np.intp),
+            np.ascontiguousarray(cols, dtype=np.intp),
+            np.ascontiguousarray(vals),
+            int(nr),
+            int(nc)
+        )
+
+
+@st.cache_data(max_entries=32)
+def agg_timeseries(*filters):
+    cube = filter_cube(*filters)
+
+    months = cube["Date"].to_numpy().astype("datetime64[M]")
+    first_month = months.min()
+    month_codes = (months - first_month).astype(np.int64)
+    ages = cube["Agegroup_pretty"].cat
+
+    sums, counts = groupsum2d(
+        month_codes,
+        ages.codes.to_numpy(),
+        cube["Deaths"].to_numpy(dtype=np.float32),
+        month_codes.max() + 1,
+        len(ages.categories)
+    )
+
+    #np.nonzero walks row-major, so the result is already ordered by Date, age group
+    month_idx, age_idx = np.nonzero(counts)
+    return pd.DataFrame({
+        "Date": (first_month + month_idx).astype(cube["Date"].dtype),
+        "Agegroup_pretty": pd.Categorical.from_codes(age_idx, ages.categories),
+        "Deaths": sums[month_idx, age_idx]
+    })
+
+
+@st.cache_data(max_entries=32)
+def agg_heat(*filters):
+    cube = filter_cube(*filters)
+
+    years = cube["Year"].to_numpy()
+    year_min = years.min()
+    ages = cube["Agegroup_pretty"].cat
+
+    sums, counts = groupsum2d(
+        years - year_min,
+        ages.codes.to_numpy(),
+        cube["Deaths"].to_numpy(dtype=np.float32),
+        years.max() - year_min + 1,
+        len(ages.categories)
+    )
+
+    #age group x year pivot over the observed groups, NaN where a pair has no rows
+    sums[counts == 0] = np.nan
+    year_keep = counts.any(axis=1)
+    age_keep = counts.any(axis=0)
+    return pd.DataFrame(
+        sums[year_keep][:, age_keep].T,
+        index=pd.Index(ages.categories[age_keep], name="Agegroup_pretty"),
+        columns=pd.Index(np.flatnonzero(year_keep) + year_min, name="Year")
+    )
+
+
+@st.cache_data(max_entries=32)
+def agg_country(*filters):
+    cube = filter_cube(*filters)
+
+    countries = cube["Country"].cat
+    country_codes = countries.codes.to_numpy()
+    n_country = len(countries.categories)
+    deaths = np.bincount(country_codes, weights=cube["Deaths"].to_numpy(), minlength=n_country)
+    counts = np.bincount(country_codes, minlength=n_country)
+
+    #each country has a single ISO3 code, so a code lookup table stands in for the second key
+    iso = cube["Country_code"].cat
+    iso_of = np.zeros(n_country, dtype=np.intp)
+    iso_of[country_codes] = iso.codes.to_numpy()
+
+    keep = np.flatnonzero(counts)
+    return pd.DataFrame({
+        "Country": countries.categories[keep],
+        "Country_code": iso.categories[iso_of[keep]],
+        "Deaths": deaths[keep]
+    })
+
+
+@st.cache_data(max_entries=32)
+def agg_region(*filters):
+    cube = filter_cube(*filters)
+
+    regions = cube["Who_region_pretty"].cat
+    region_codes = regions.codes.to_numpy()
+    #rows without a region (code -1) are left out, as groupby does with NaN keys
+    has_region = region_codes >= 0
+    n_region = len(regions.categories)
+    deaths = np.bincount(
+        region_codes[has_region],
+        weights=cube["Deaths"].to_numpy()[has_region],
+        minlength=n_region
+    )
+    counts = np.bincount(region_codes[has_region], minlength=n_region)
+
+    keep = np.flatnonzero(counts)
+    return pd.DataFrame({
+        "Who_region_pretty": regions.categories[keep],
+        "Deaths": deaths[keep]
+    }).sort_values("Deaths", ascending=False)
+
+
+@st.cache_data(max_entries=32)
+def ts_stats(*filters):
+    #death counts are whole numbers, so the mode is a bincount argmax (offset by the
+    #minimum in case corrections ever push a month below zero)
+    deaths = agg_timeseries(*filters)["Deaths"].to_numpy()
+    deaths_int = deaths.astype(np.int64)
+    median_deaths = np.median(deaths)
+    if deaths_int.size:
+        deaths_min = deaths_int.min()
+        mode_deaths = int(np.bincount(deaths_int - deaths_min).argmax() + deaths_min)
+    else:
+        mode_deaths = None
+    return median_deaths, mode_deaths